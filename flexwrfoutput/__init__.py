@@ -1,4 +1,4 @@
 # flake8: noqa
 from .__version__ import __version__
 from .accessors import FLEXWRFDatasetAccessor
-from .openfiles import open_output
+from .openfiles import open_nested_output, open_output
@@ -1,16 +1,14 @@
 """Define xarray accessors to make FLEXPART-WRF output more consistent to WRF data
-    loaded via xWRF module."""
+    loaded via xWRF module.
+
+The postprocessing modules depend on xWRF and pyproj, which are slow to import. They
+are only imported when an accessor method is called, so that registering the accessor
+on `import flexwrfoutput` stays cheap."""
 from __future__ import annotations  # noqa: F401
 
-import xarray as xr
+from typing import Iterator, List, Optional
 
-from flexwrfoutput.add_wrf_projection import _add_wrf_projection
-from flexwrfoutput.postprocess import (
-    _apply_xwrf_pipes,
-    _make_attrs_consistent,
-    _prepare_conc_units,
-    _prepare_coordinates,
-)
+import xarray as xr
 
 
 class FLEXWRFAccessor:
@@ -27,6 +25,13 @@ class FLEXWRFDatasetAccessor(FLEXWRFAccessor):
     """Adds a number of FLEXPART-WRF specific methods to xarray.Dataset objects."""
 
     def postprocess(self) -> xr.Dataset:
+        from flexwrfoutput.postprocess import (
+            _apply_xwrf_pipes,
+            _make_attrs_consistent,
+            _prepare_conc_units,
+            _prepare_coordinates,
+        )
+
         ds = (
             self.xarray_obj.pipe(_prepare_conc_units)
             .pipe(_make_attrs_consistent)
@@ -35,9 +40,73 @@ class FLEXWRFDatasetAccessor(FLEXWRFAccessor):
         ds = _apply_xwrf_pipes(ds)
         return ds
 
+    def iter_postprocessed(
+        self, batch_size: int = 1, by: str = "MTime"
+    ) -> Iterator[xr.Dataset]:
+        """
+        Postprocess the dataset in batches of releases to bound the memory usage.
+
+        Work shared by all releases (time coordinate, domain center, projection
+        coordinates) is done once.
+        Each yielded dataset only selects its own releases, so lazily opened data is
+        read batch by batch.
+
+        Args:
+            batch_size (int, optional): Number of MTime or MPlace values per batch.
+                Defaults to 1.
+            by (str, optional): Batch releases by "MTime" or "MPlace". Defaults to
+                "MTime".
+
+        Yields:
+            xr.Dataset: Postprocessed dataset of a batch of releases.
+        """
+        from flexwrfoutput.postprocess import (
+            _apply_xwrf_pipes,
+            _get_projection_coordinates,
+            _iter_release_batches,
+            _make_attrs_consistent,
+            _prepare_conc_units,
+            _prepare_release_coordinates,
+            _prepare_shared_coordinates,
+        )
+
+        ds = (
+            self.xarray_obj.pipe(_prepare_conc_units)
+            .pipe(_make_attrs_consistent)
+            .pipe(_prepare_shared_coordinates)
+        )
+        grid = _get_projection_coordinates(ds)
+        for releases in _iter_release_batches(ds, batch_size, by):
+            yield _apply_xwrf_pipes(
+                ds.isel(releases=releases).pipe(_prepare_release_coordinates), grid
+            )
+
+    def extract_receptors(
+        self, variables: Optional[List[str]] = None, method: str = "linear"
+    ) -> xr.Dataset:
+        """
+        Extract the time series of all receptors of the header from a postprocessed
+            dataset.
+
+        Args:
+            variables (List[str], optional): Gridded variables to extract. Defaults to
+                ["CONC"].
+            method (str, optional): "linear" interpolation or "nearest" grid cell.
+                Defaults to "linear".
+
+        Returns:
+            xr.Dataset: Variables with dimensions receptor and Time instead of x and y.
+        """
+        from flexwrfoutput.postprocess import _extract_receptor_timeseries
+
+        variables = ["CONC"] if variables is None else list(variables)
+        return _extract_receptor_timeseries(self.xarray_obj, variables, method)
+
     def add_wrf_projection(self) -> xr.Dataset:
         """
         Add the wrf projection to the dataset.
         """
+        from flexwrfoutput.add_wrf_projection import _add_wrf_projection
+
         ds = self.xarray_obj.pipe(_add_wrf_projection)
         return ds
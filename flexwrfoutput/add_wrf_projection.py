@@ -2,25 +2,52 @@
 Functions needed to only add the wrf projection to the dataset. Based on the
 implementation in xWRF https://github.com/xarray-contrib/xwrf/blob/main/xwrf/grid.py#L18
 """
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import pyproj
 import xarray as xr
 
+if TYPE_CHECKING:
+    import pyproj
+
 
 def _get_wrf_projection(ds: xr.Dataset) -> pyproj.CRS:
-    # Use standards from a typical WRF file
-    cen_lon = ds.CEN_LON
-    proj_id = ds.MAP_PROJ
+    return _get_cached_wrf_projection(
+        int(ds.MAP_PROJ),
+        float(ds.TRUELAT1),
+        float(getattr(ds, "TRUELAT2", ds.TRUELAT1)),
+        float(ds.MOAD_CEN_LAT),
+        float(ds.STAND_LON),
+        float(ds.CEN_LON),
+    )
+
+
+@lru_cache(maxsize=32)
+def _get_cached_wrf_projection(
+    proj_id: int,
+    truelat1: float,
+    truelat2: float,
+    moad_cen_lat: float,
+    stand_lon: float,
+    cen_lon: float,
+) -> pyproj.CRS:
+    """
+    Construct the projection only once for each set of projection attributes.
+    """
+    import pyproj
 
+    # Use standards from a typical WRF file
     pargs = {
         "x_0": 0,
         "y_0": 0,
         "a": 6370000,
         "b": 6370000,
-        "lat_1": ds.TRUELAT1,
-        "lat_2": getattr(ds, "TRUELAT2", ds.TRUELAT1),
-        "lat_0": ds.MOAD_CEN_LAT,
-        "lon_0": ds.STAND_LON,
+        "lat_1": truelat1,
+        "lat_2": truelat2,
+        "lat_0": moad_cen_lat,
+        "lon_0": stand_lon,
         "center_lon": cen_lon,
     }
 
@@ -54,3 +81,15 @@ def _add_wrf_projection(ds: xr.Dataset) -> xr.Dataset:
     wrf_crs = _get_wrf_projection(ds)
     ds["wrf_projection"] = (tuple(), wrf_crs, wrf_crs.to_cf())
     return ds
+
+
+def _make_projection_serializable(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Replace the pyproj object in `wrf_projection` with a CF grid mapping variable so
+        the dataset can be written to netCDF.
+    """
+    if "wrf_projection" in ds.variables:
+        attrs = dict(ds.wrf_projection.attrs)
+        ds = ds.drop_vars("wrf_projection")
+        ds["wrf_projection"] = (tuple(), 0, attrs)
+    return ds
@@ -0,0 +1,213 @@
+"""
+Postprocess many FLEXPART-WRF output directories in a process pool.
+
+The status of every run is stored in a JSON state file so that an interrupted batch
+can be resumed without redoing finished runs.
+"""
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from glob import glob
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+STATE_FILENAME = ".flexwrfoutput_batch_state.json"
+# Minimum time between two writes of the state file (seconds)
+STATE_WRITE_INTERVAL = 5
+
+
+def _expand_output_dirs(patterns: Iterable[Union[str, Path]]) -> List[Path]:
+    """Expands paths and glob patterns to a sorted list of unique directories.
+
+    Args:
+        patterns (Iterable[Union[str, Path]]): Directories or glob patterns.
+
+    Returns:
+        List[Path]: Existing directories matching the patterns.
+    """
+    output_dirs = set()
+    for pattern in patterns:
+        matches = glob(str(pattern)) or [str(pattern)]
+        output_dirs.update(Path(match) for match in matches if Path(match).is_dir())
+    return sorted(output_dirs)
+
+
+def _get_target_paths(output_dirs: List[Path], target_dir: Path) -> Dict[Path, Path]:
+    """Assigns a netCDF file in the target directory to each output directory.
+
+    Args:
+        output_dirs (List[Path]): Output directories of FLEXPART-WRF.
+        target_dir (Path): Directory for the postprocessed files.
+
+    Returns:
+        Dict[Path, Path]: Mapping of output directory to postprocessed file.
+    """
+    targets = {}
+    for output_dir in output_dirs:
+        target = target_dir / f"{output_dir.resolve().name}.nc"
+        if target in targets.values():
+            raise ValueError(
+                f"Multiple output directories would be written to {target}"
+            )
+        targets[output_dir] = target
+    return targets
+
+
+def _read_state(state_path: Path) -> dict:
+    if state_path.exists():
+        with open(state_path) as state_file:
+            return json.load(state_file)
+    return {}
+
+
+def _write_state(state: dict, state_path: Path) -> None:
+    """Writes the state file atomically, so an interruption cannot corrupt it."""
+    tmp_path = state_path.with_name(f"{state_path.name}.tmp")
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def _is_done(state: dict, output_dir: Path, target: Path) -> bool:
+    entry = state.get(str(output_dir.resolve()))
+    return (
+        entry is not None
+        and entry["status"] == "done"
+        and entry["target"] == str(target.resolve())
+        and target.exists()
+    )
+
+
+def _postprocess_to_netcdf(output_dir: Path, target: Path) -> dict:
+    """Opens, postprocesses and writes a single output directory.
+
+    Meant to be run in a worker process, so errors are returned instead of raised.
+
+    Args:
+        output_dir (Path): Output directory of FLEXPART-WRF.
+        target (Path): Path of the postprocessed netCDF file.
+
+    Returns:
+        dict: Status entry of the run.
+    """
+    import flexwrfoutput  # noqa: F401
+    from flexwrfoutput.add_wrf_projection import _make_projection_serializable
+    from flexwrfoutput.openfiles import _get_output_paths, open_output
+
+    start = time.perf_counter()
+    tmp_target = target.with_name(f".{target.name}.tmp")
+    try:
+        input_size = sum(path.stat().st_size for path in _get_output_paths(output_dir))
+        with open_output(output_dir) as ds:
+            ds = ds.flexwrf.postprocess().pipe(_make_projection_serializable)
+            ds.to_netcdf(tmp_target)
+        os.replace(tmp_target, target)
+    except Exception as e:
+        tmp_target.unlink(missing_ok=True)
+        return dict(
+            status="failed",
+            target=str(target.resolve()),
+            error=f"{type(e).__name__}: {e}",
+            duration=time.perf_counter() - start,
+        )
+    return dict(
+        status="done",
+        target=str(target.resolve()),
+        input_size=input_size,
+        duration=time.perf_counter() - start,
+    )
+
+
+def run_batch(
+    output_dirs: Iterable[Union[str, Path]],
+    target_dir: Union[str, Path],
+    max_workers: Optional[int] = None,
+    state_path: Optional[Union[str, Path]] = None,
+    verbose: bool = True,
+) -> dict:
+    """Postprocesses FLEXPART-WRF output directories in parallel and writes them to
+        netCDF.
+
+    Runs which are marked as done in the state file are skipped, so rerunning the same
+    command resumes an interrupted batch.
+
+    Args:
+        output_dirs (Iterable[Union[str, Path]]): Output directories or glob patterns.
+        target_dir (Union[str, Path]): Directory for the postprocessed files.
+        max_workers (Optional[int], optional): Number of worker processes. Defaults to
+            all available cores.
+        state_path (Optional[Union[str, Path]], optional): Path of the state file.
+            Defaults to a file in the target directory.
+        verbose (bool, optional): Print progress and throughput. Defaults to True.
+
+    Returns:
+        dict: Summary with the number of processed, skipped and failed runs.
+    """
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    state_path = Path(state_path) if state_path else target_dir / STATE_FILENAME
+    if max_workers is None:
+        # sched_getaffinity respects CPU restrictions but is only available on Linux
+        if hasattr(os, "sched_getaffinity"):
+            max_workers = len(os.sched_getaffinity(0))
+        else:
+            max_workers = os.cpu_count()
+
+    targets = _get_target_paths(_expand_output_dirs(output_dirs), target_dir)
+    state = _read_state(state_path)
+    todo = {
+        output_dir: target
+        for output_dir, target in targets.items()
+        if not _is_done(state, output_dir, target)
+    }
+    summary = dict(total=len(targets), skipped=len(targets) - len(todo))
+    summary.update(done=0, failed=0, input_size=0)
+    if verbose:
+        print(
+            f"{summary['total']} runs, {summary['skipped']} already done, "
+            f"{len(todo)} to process with {max_workers} workers"
+        )
+
+    def record(future: Future) -> None:
+        output_dir = futures.pop(future)
+        entry = future.result()
+        state[str(output_dir.resolve())] = entry
+        summary[entry["status"]] += 1
+        summary["input_size"] += entry.get("input_size", 0)
+        if verbose and entry["status"] == "failed":
+            print(f"Failed {output_dir}: {entry['error']}")
+
+    start = last_write = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    futures = {}
+    try:
+        for output_dir, target in todo.items():
+            future = executor.submit(_postprocess_to_netcdf, output_dir, target)
+            futures[future] = output_dir
+        for future in as_completed(list(futures)):
+            record(future)
+            if time.perf_counter() - last_write > STATE_WRITE_INTERVAL:
+                _write_state(state, state_path)
+                last_write = time.perf_counter()
+        executor.shutdown()
+    except BaseException:
+        # Do not wait for the queued runs, but keep the ones that already finished
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in list(futures):
+            if future.done() and not future.cancelled() and not future.exception():
+                record(future)
+        raise
+    finally:
+        _write_state(state, state_path)
+    summary["duration"] = time.perf_counter() - start
+
+    if verbose:
+        processed = summary["done"] + summary["failed"]
+        duration = max(summary["duration"], 1e-9)
+        print(
+            f"Processed {processed} runs ({summary['failed']} failed) in "
+            f"{summary['duration']:.1f} s: {processed / duration:.2f} runs/s, "
+            f"{summary['input_size'] / duration / 1e6:.1f} MB/s"
+        )
+    return summary
@@ -0,0 +1,202 @@
+"""
+Cache postprocessed FLEXPART-WRF output on disk.
+
+Entries are netCDF files named after a hash of the paths, sizes and modification times
+of the `flxout` and `header` files, the version of flexwrfoutput and the postprocess
+options. Changing the output files or updating the module therefore invalidates the
+entry. The cache can be shared by several processes: entries are written to a temporary
+file and moved into place atomically, eviction is done under a file lock. Datasets
+opened from the cache hold a shared lock on their entry until they are closed, and
+eviction skips locked entries.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Optional, Union
+
+import xarray as xr
+
+from flexwrfoutput.__version__ import __version__
+from flexwrfoutput.openfiles import _get_output_paths, open_output
+
+LOCK_FILENAME = ".lock"
+
+
+def _get_cache_key(output_dir: Union[str, Path], options: dict) -> str:
+    """Hash identifying the postprocessed output of a directory.
+
+    Args:
+        output_dir (Union[str, Path]): Path of output directory of FLEXPART-WRF.
+        options (dict): Options of the postprocessing.
+
+    Returns:
+        str: Hex digest of the key.
+    """
+    files = []
+    for path in _get_output_paths(output_dir):
+        stat = path.stat()
+        files.append((str(path.resolve()), stat.st_size, stat.st_mtime_ns))
+    fingerprint = dict(files=files, version=__version__, options=options)
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def _lock_entry(entry_file: IO, entry_path: Path, operation: int) -> bool:
+    """Locks an opened entry and checks that it is still the file at `entry_path`."""
+    fcntl.flock(entry_file, operation)
+    try:
+        return os.stat(entry_path).st_ino == os.fstat(entry_file.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _write_cache_entry(ds: xr.Dataset, entry_path: Path) -> IO:
+    """Writes a postprocessed dataset atomically to the cache.
+
+    Returns:
+        IO: Entry file holding a shared lock, so the new entry cannot be evicted before
+            it is opened.
+    """
+    from flexwrfoutput.add_wrf_projection import _make_projection_serializable
+
+    fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        ds.pipe(_make_projection_serializable).to_netcdf(tmp_path)
+        entry_file = open(tmp_path, "rb")
+        fcntl.flock(entry_file, fcntl.LOCK_SH)
+        os.replace(tmp_path, entry_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return entry_file
+
+
+def _open_cache_entry(
+    entry_path: Path, chunks: Optional[dict], entry_file: Optional[IO] = None
+) -> Optional[xr.Dataset]:
+    """Opens a cache entry and keeps a shared lock on it until the dataset is closed.
+
+    Args:
+        entry_path (Path): Path of the entry.
+        chunks (Optional[dict]): Chunks of the dataset.
+        entry_file (Optional[IO], optional): Entry file which is already locked.
+            Defaults to None.
+
+    Returns:
+        Optional[xr.Dataset]: Postprocessed data, None if the entry does not exist.
+    """
+    if entry_file is None:
+        try:
+            entry_file = open(entry_path, "rb")
+        except FileNotFoundError:
+            return None
+        if not _lock_entry(entry_file, entry_path, fcntl.LOCK_SH):
+            # Entry was evicted or replaced while waiting for the lock
+            entry_file.close()
+            return None
+
+    try:
+        ds = xr.open_dataset(entry_path, chunks=chunks)
+    except BaseException:
+        entry_file.close()
+        raise
+    close_dataset = ds._close
+
+    def close_and_unlock():
+        if close_dataset is not None:
+            close_dataset()
+        entry_file.close()
+
+    ds.set_close(close_and_unlock)
+    return ds.flexwrf.add_wrf_projection()
+
+
+def _evict_cache_entries(cache_dir: Path, max_cache_size: int) -> None:
+    """Removes the least recently used entries until the cache fits in the given size.
+
+    Entries which are in use by an opened dataset are kept.
+
+    Args:
+        cache_dir (Path): Directory of the cache.
+        max_cache_size (int): Maximum size of the cache in bytes.
+    """
+    with open(cache_dir / LOCK_FILENAME, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        entries = []
+        for entry_path in cache_dir.glob("*.nc"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if cache_size <= max_cache_size:
+                break
+            try:
+                entry_file = open(entry_path, "rb")
+            except FileNotFoundError:
+                cache_size -= size
+                continue
+            with entry_file:
+                try:
+                    if not _lock_entry(
+                        entry_file, entry_path, fcntl.LOCK_EX | fcntl.LOCK_NB
+                    ):
+                        continue
+                except BlockingIOError:
+                    # Entry is in use
+                    continue
+                entry_path.unlink()
+                cache_size -= size
+
+
+def open_postprocessed_output(
+    output_dir: Union[str, Path],
+    cache_dir: Optional[Union[str, Path]] = None,
+    max_cache_size: Optional[int] = None,
+    chunks: Optional[dict] = None,
+) -> xr.Dataset:
+    """Opens and postprocesses output of FLEXPART-WRF, using an on-disk cache of the
+        postprocessed data if a cache directory is given.
+
+    With a cache the data is always read from the cache entry, which is not evicted
+    before the returned dataset is closed.
+
+    Args:
+        output_dir (Union[str, Path]): Directory with FLEXPART-WRF output files.
+        cache_dir (Optional[Union[str, Path]], optional): Directory of the cache.
+            Defaults to None (no caching).
+        max_cache_size (Optional[int], optional): Maximum size of the cache in bytes,
+            least recently used entries are removed. Defaults to None (no limit).
+        chunks (Optional[dict], optional): Chunks of the returned dataset, applied when
+            opening the cache entry or the flxout file. Defaults to None.
+
+    Returns:
+        xr.Dataset: Postprocessed data including the `wrf_projection`.
+    """
+    if cache_dir is None:
+        return open_output(output_dir, flxout_chunks=chunks).flexwrf.postprocess()
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry_path = cache_dir / f"{_get_cache_key(output_dir, dict(postprocess=True))}.nc"
+
+    try:
+        # Mark entry as recently used
+        os.utime(entry_path)
+    except FileNotFoundError:
+        pass
+    ds = _open_cache_entry(entry_path, chunks)
+    if ds is not None:
+        return ds
+
+    with open_output(output_dir) as raw:
+        entry_file = _write_cache_entry(raw.flexwrf.postprocess(), entry_path)
+    ds = _open_cache_entry(entry_path, chunks, entry_file)
+    if max_cache_size is not None:
+        _evict_cache_entries(cache_dir, max_cache_size)
+    return ds
@@ -0,0 +1,59 @@
+"""Command line interface of flexwrfoutput."""
+import argparse
+from typing import List, Optional
+
+
+def _batch(args: argparse.Namespace) -> int:
+    from flexwrfoutput.batch import run_batch
+
+    summary = run_batch(
+        args.output_dirs,
+        args.target_dir,
+        max_workers=args.workers,
+        state_path=args.state_file,
+    )
+    return int(summary["failed"] > 0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="flexwrfoutput",
+        description="Tools for the output of FLEXPART-WRF.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Postprocess many output directories in parallel and save as netCDF.",
+    )
+    batch_parser.add_argument(
+        "output_dirs",
+        nargs="+",
+        help="Output directories of FLEXPART-WRF or glob patterns matching them.",
+    )
+    batch_parser.add_argument(
+        "-o",
+        "--target-dir",
+        required=True,
+        help="Directory for the postprocessed files (<output dir name>.nc).",
+    )
+    batch_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: all available cores).",
+    )
+    batch_parser.add_argument(
+        "--state-file",
+        default=None,
+        help="State file to resume interrupted batches (default: in target dir).",
+    )
+    batch_parser.set_defaults(func=_batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+"""
+Functions to combine footprints of nested FLEXPART-WRF domains on the outer grid.
+
+Works on the postprocessed domains as returned by `open_nested_output`.
+"""
+import hashlib
+from typing import Dict, Tuple
+
+import numpy as np
+import xarray as xr
+
+# Mappings between grids by compact grid key, see `_get_outer_grid_mapping`
+_GRID_MAPPING_CACHE: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = {}
+GRID_MAPPING_CACHE_SIZE = 32
+
+
+def _map_to_outer_grid(
+    outer_crs_wkt: str,
+    outer_grid: Tuple[float, float, int, float, float, int],
+    inner_lon: np.ndarray,
+    inner_lat: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Finds the outer grid cell containing each cell center of an inner domain.
+
+    Args:
+        outer_crs_wkt (str): Projection of the outer domain.
+        outer_grid (Tuple[float, float, int, float, float, int]): Origin, spacing and
+            size of the outer grid as (y0, dy, ny, x0, dx, nx).
+        inner_lon (np.ndarray): Longitudes of the inner cell centers.
+        inner_lat (np.ndarray): Latitudes of the inner cell centers.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (y index, x index) on the outer grid for each
+            (flattened) inner cell, -1 where the inner cell is outside the outer grid.
+    """
+    import pyproj
+
+    outer_crs = pyproj.CRS.from_wkt(outer_crs_wkt)
+    transformer = pyproj.Transformer.from_crs(
+        outer_crs.geodetic_crs, outer_crs, always_xy=True
+    )
+    x, y = transformer.transform(inner_lon.ravel(), inner_lat.ravel())
+
+    y0, dy, ny, x0, dx, nx = outer_grid
+    indices = []
+    for coord, origin, spacing, size in [(y, y0, dy, ny), (x, x0, dx, nx)]:
+        index = np.rint((coord - origin) / spacing).astype(int)
+        index[(index < 0) | (index >= size)] = -1
+        indices.append(index)
+    y_index, x_index = indices
+    outside = (y_index == -1) | (x_index == -1)
+    y_index[outside] = -1
+    x_index[outside] = -1
+    return y_index, x_index
+
+
+def _get_outer_grid_mapping(
+    outer: xr.Dataset, inner: xr.Dataset
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cached mapping of the cells of an inner domain to the outer grid.
+
+    The cache is keyed on the projection, origin, spacing and size of the outer grid
+    and a digest of the inner cell centers, so no copies of the grids are kept.
+    """
+    outer_grid = tuple(
+        value
+        for dim in ["y", "x"]
+        for value in (
+            float(outer[dim].values[0]),
+            float(outer[dim].values[1] - outer[dim].values[0]),
+            outer.sizes[dim],
+        )
+    )
+    inner_lon = inner.XLONG.transpose("y", "x").values.astype("float64")
+    inner_lat = inner.XLAT.transpose("y", "x").values.astype("float64")
+    inner_digest = hashlib.sha1(inner_lon.tobytes())
+    inner_digest.update(inner_lat.tobytes())
+    key = (
+        outer.wrf_projection.item().to_wkt(),
+        outer_grid,
+        inner_lon.shape,
+        inner_digest.hexdigest(),
+    )
+
+    if key not in _GRID_MAPPING_CACHE:
+        if len(_GRID_MAPPING_CACHE) >= GRID_MAPPING_CACHE_SIZE:
+            # Remove the oldest mapping
+            del _GRID_MAPPING_CACHE[next(iter(_GRID_MAPPING_CACHE))]
+        _GRID_MAPPING_CACHE[key] = _map_to_outer_grid(
+            key[0], outer_grid, inner_lon, inner_lat
+        )
+    return _GRID_MAPPING_CACHE[key]
+
+
+def _regrid_to_outer(
+    outer: xr.Dataset, inner: xr.Dataset, variable: str
+) -> xr.DataArray:
+    """Area weighted mean of the inner domain on each outer grid cell it covers.
+
+    Outer grid cells which are not covered by the inner domain are NaN.
+    """
+    y_index, x_index = _get_outer_grid_mapping(outer, inner)
+    inside = y_index != -1
+
+    outer_cell = xr.DataArray(
+        y_index[inside] * outer.sizes["x"] + x_index[inside], dims="cell"
+    )
+
+    def flatten(da: xr.DataArray) -> xr.DataArray:
+        return (
+            da.reset_coords(drop=True)
+            .drop_vars(["y", "x"], errors="ignore")
+            .stack(cell=("y", "x"), create_index=False)
+            .isel(cell=inside)
+            .assign_coords(outer_cell=outer_cell)
+        )
+
+    weights = inner["GRIDAREA"] if "GRIDAREA" in inner else xr.ones_like(inner.XLAT)
+    flat_field = flatten(inner[variable].transpose(..., "y", "x"))
+    flat_weights = flatten(weights.transpose("y", "x"))
+
+    regridded = (flat_field * flat_weights).groupby("outer_cell").sum() / (
+        flat_weights.groupby("outer_cell").sum()
+    )
+    cell_y, cell_x = np.divmod(regridded.outer_cell.values, outer.sizes["x"])
+    regridded = (
+        regridded.assign_coords(
+            y=("outer_cell", outer.y.values[cell_y]),
+            x=("outer_cell", outer.x.values[cell_x]),
+        )
+        .set_index(outer_cell=["y", "x"])
+        .unstack("outer_cell")
+    )
+    return regridded.reindex(y=outer.y, x=outer.x)
+
+
+def combine_nested_footprints(tree, variable: str = "CONC") -> xr.DataArray:
+    """Combines a variable of all domains of nested output on the grid of the outer
+        domain.
+
+    Outer grid cells covered by an inner domain take the area weighted mean of the
+    inner cells whose centers fall into them. Domains are applied from outer to inner,
+    so the finest domain covering a cell takes precedence. The mapping between the grids
+    is cached, so repeated calls for the same domains only aggregate the data.
+
+    Args:
+        tree (DataTree): Postprocessed nested output from `open_nested_output`.
+        variable (str, optional): Variable to combine. Defaults to "CONC".
+
+    Returns:
+        xr.DataArray: Combined variable on the grid of the outer domain.
+    """
+    outer_name, *inner_names = sorted(tree.children)
+    outer = tree[outer_name].to_dataset()
+    combined = outer[variable]
+    for inner_name in inner_names:
+        regridded = _regrid_to_outer(outer, tree[inner_name].to_dataset(), variable)
+        combined = regridded.combine_first(combined)
+    return combined.transpose(*outer[variable].dims)
@@ -3,11 +3,15 @@ Functions to handle raw netCDF output of FLEXPART-WRF.
 
 Meant to be used before the postprocessing with the accessor.
 """
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple, Union
+from typing import Dict, Optional, Tuple, Union
 
 import xarray as xr
 
+DOMAIN_PATTERN = re.compile(r"_(d\d{2})")
+
 
 def _combine_output_and_header(flxout: xr.Dataset, header: xr.Dataset) -> xr.Dataset:
     """Combines dimensions of flxout with header to have full information of output in\
@@ -72,6 +76,7 @@ def _get_output_paths(path: Union[str, Path]) -> Tuple[Path, Path]:
         raise (
             AmbiguousPathError(
                 f"Found multiple {duplicate_filetype} files in given directory {path}"
+                ", use open_nested_output for nested output"
             )
         )
 
@@ -96,3 +101,106 @@ def open_output(
         xr.open_dataset(flxout_path, chunks=flxout_chunks),
         xr.open_dataset(header_path, chunks=header_chunks),
     )
+
+
+def _get_nested_output_paths(path: Union[str, Path]) -> Dict[str, Tuple[Path, Path]]:
+    """Finds header and flxout files of all domains of nested output in a directory.
+
+    Args:
+        path (Union[str, Path]): Path of output directory of FLEXPART-WRF.
+
+    Returns:
+        Dict[str, Tuple[Path, Path]]: (flxout path, header path) for each domain (e.g.
+            "d01"), sorted from outer to inner domain.
+    """
+    path = Path(path)
+
+    domain_files = {}
+    for ftype in ["flxout", "header"]:
+        for file in path.glob(f"{ftype}*"):
+            match = DOMAIN_PATTERN.search(file.name)
+            if match is None:
+                continue
+            domain_files.setdefault(match.group(1), {})
+            if ftype in domain_files[match.group(1)]:
+                raise (
+                    AmbiguousPathError(
+                        f"Found multiple {ftype} files for domain {match.group(1)} in "
+                        f"given directory {path}"
+                    )
+                )
+            domain_files[match.group(1)][ftype] = file
+
+    if not domain_files:
+        raise (
+            FileNotFoundError(
+                "Did not find flxout or header files of any domain in given directory "
+                f"{path}"
+            )
+        )
+    for domain, files in domain_files.items():
+        missing_file = " or ".join(
+            fname for fname in ["header", "flxout"] if fname not in files
+        )
+        if missing_file:
+            raise (
+                FileNotFoundError(
+                    f"Did not find a {missing_file} file for domain {domain} in given "
+                    f"directory {path}"
+                )
+            )
+
+    return {
+        domain: (files["flxout"], files["header"])
+        for domain, files in sorted(domain_files.items())
+    }
+
+
+def _get_datatree_class() -> type:
+    try:
+        from xarray import DataTree
+    except ImportError:
+        try:
+            from datatree import DataTree
+        except ImportError as e:
+            raise ImportError(
+                "Opening nested output requires xarray>=2024.10 or xarray-datatree."
+            ) from e
+    return DataTree
+
+
+def open_nested_output(
+    output_dir: Union[str, Path],
+    flxout_chunks: Optional[dict] = None,
+    header_chunks: Optional[dict] = None,
+    postprocess: bool = True,
+):
+    """Opens all domains of nested FLEXPART-WRF output into one DataTree.
+
+    The domains are opened (and postprocessed) concurrently. Each domain is a child
+    node named after the domain (e.g. "d01") which carries its own `wrf_projection`.
+
+    Args:
+        output_dir (Union[str, Path]): Directory with FLEXPART-WRF output files.
+        postprocess (bool, optional): Apply the `postprocess` accessor to each domain.
+            Defaults to True.
+
+    Returns:
+        DataTree: Merged data of each domain.
+    """
+    DataTree = _get_datatree_class()
+
+    def open_domain(paths: Tuple[Path, Path]) -> xr.Dataset:
+        flxout_path, header_path = paths
+        ds = _combine_output_and_header(
+            xr.open_dataset(flxout_path, chunks=flxout_chunks),
+            xr.open_dataset(header_path, chunks=header_chunks),
+        )
+        return ds.flexwrf.postprocess() if postprocess else ds
+
+    domain_paths = _get_nested_output_paths(Path(output_dir))
+    with ThreadPoolExecutor(max_workers=len(domain_paths)) as executor:
+        domains = dict(
+            zip(domain_paths, executor.map(open_domain, domain_paths.values()))
+        )
+    return DataTree.from_dict(domains)
@@ -2,18 +2,11 @@
 Additional functions needed in preprocess to secure compatibility to xWRF
 """
 from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import xarray as xr
-from xwrf.postprocess import (
-    _assign_coord_to_dim_of_different_name,
-    _collapse_time_dim,
-    _include_projection_coordinates,
-    _make_units_pint_friendly,
-    _modify_attrs_to_cf,
-    _rename_dims,
-)
 
 
 def _prepare_conc_units(ds: xr.Dataset) -> xr.Dataset:
@@ -84,13 +77,18 @@ def _assign_time_coord(ds: xr.Dataset) -> xr.Dataset:
     return ds
 
 
-def _split_releases_into_multiple_dimensions(ds: xr.Dataset) -> xr.Dataset:
-    """Split releases according to the time and name of the release."""
-    measurement_times = (
+def _get_measurement_times(ds: xr.Dataset) -> np.ndarray:
+    """Time of measurement of each release (center of release interval)."""
+    return (
         _extract_simulation_start(ds)
         + ds.ReleaseTstart_end.values.mean(axis=1).astype("timedelta64[s]")
     ).astype("datetime64[ns]")
 
+
+def _split_releases_into_multiple_dimensions(ds: xr.Dataset) -> xr.Dataset:
+    """Split releases according to the time and name of the release."""
+    measurement_times = _get_measurement_times(ds)
+
     measurement_names = ds.ReleaseName.values
 
     new_releases_coordinates = xr.Coordinates.from_pandas_multiindex(
@@ -191,9 +189,9 @@ def _add_measurement_information(ds: xr.Dataset) -> xr.Dataset:
     return ds
 
 
-def _prepare_coordinates(ds: xr.Dataset) -> xr.Dataset:
+def _prepare_shared_coordinates(ds: xr.Dataset) -> xr.Dataset:
     """
-    Set useful coordinates.
+    Set coordinates which do not depend on the releases.
     """
     # if created with flexwrfinput z dim corresponds to z_stag of WRF
     ds = ds.rename_dims({"bottom_top": "z_stag"})
@@ -203,19 +201,169 @@ def _prepare_coordinates(ds: xr.Dataset) -> xr.Dataset:
     )
     # Set times as coordinates in datetime64 format
     ds = _assign_time_coord(ds)
-    # take care of releases
+    return ds
+
+
+def _prepare_release_coordinates(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Split releases into MTime and MPlace and add measurement information.
+    """
     ds = _split_releases_into_multiple_dimensions(ds)
     ds = _add_measurement_information(ds)
     return ds
 
 
-def _apply_xwrf_pipes(ds: xr.Dataset) -> xr.Dataset:
+def _prepare_coordinates(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Set useful coordinates.
+    """
+    ds = _prepare_shared_coordinates(ds)
+    # take care of releases
+    ds = _prepare_release_coordinates(ds)
+    return ds
+
+
+def _iter_release_batches(
+    ds: xr.Dataset, batch_size: int, by: str
+) -> Iterator[np.ndarray]:
+    """
+    Yield indices of the releases belonging to `batch_size` consecutive values of
+        MTime or MPlace.
+    """
+    if by == "MTime":
+        keys = _get_measurement_times(ds)
+    elif by == "MPlace":
+        keys = ds.ReleaseName.values
+    else:
+        raise ValueError(f"Releases can only be batched by MTime or MPlace, not {by}")
+    if batch_size < 1:
+        raise ValueError(f"batch_size has to be positive, not {batch_size}")
+
+    unique_keys = np.unique(keys)
+    for start in range(0, len(unique_keys), batch_size):
+        yield np.flatnonzero(np.isin(keys, unique_keys[start : start + batch_size]))
+
+
+def _apply_xwrf_pipes(ds: xr.Dataset, grid: Optional[xr.Dataset] = None) -> xr.Dataset:
+    """
+    Apply the xWRF postprocessing. If `grid` is given, its projection coordinates
+        (see `_get_projection_coordinates`) are assigned instead of computing them.
+    """
+    from xwrf.postprocess import (
+        _assign_coord_to_dim_of_different_name,
+        _collapse_time_dim,
+        _include_projection_coordinates,
+        _make_units_pint_friendly,
+        _modify_attrs_to_cf,
+        _rename_dims,
+    )
+
     ds = (
         ds.pipe(_modify_attrs_to_cf)
         .pipe(_make_units_pint_friendly)
         .pipe(_collapse_time_dim)
         .pipe(_assign_coord_to_dim_of_different_name)
-        .pipe(_include_projection_coordinates)
-        .pipe(_rename_dims)
     )
+    if grid is None:
+        ds = ds.pipe(_include_projection_coordinates).pipe(_rename_dims)
+    else:
+        ds = ds.pipe(_rename_dims).pipe(_assign_projection_coordinates, grid)
     return ds
+
+
+def _get_projection_coordinates(ds: xr.Dataset) -> xr.Dataset:
+    """
+    Compute x, y and wrf_projection of the grid once on a view without releases.
+    """
+    grid = _apply_xwrf_pipes(ds.drop_dims("releases"))
+    return grid[["wrf_projection"]].assign_coords(x=grid.x, y=grid.y)
+
+
+def _assign_projection_coordinates(ds: xr.Dataset, grid: xr.Dataset) -> xr.Dataset:
+    """
+    Assign precomputed projection coordinates to a dataset with renamed dimensions.
+    """
+    ds = ds.assign_coords(x=grid.x, y=grid.y)
+    ds["wrf_projection"] = grid.wrf_projection
+    for varname in ds.data_vars:
+        if {"x", "y"} & set(ds[varname].dims):
+            ds[varname].attrs["grid_mapping"] = "wrf_projection"
+    return ds
+
+
+def _get_receptor_grid_positions(ds: xr.Dataset) -> Tuple[xr.DataArray, xr.DataArray]:
+    """
+    Project the receptor locations of the header onto the x and y coordinates of the
+        postprocessed grid.
+    """
+    import pyproj
+
+    from flexwrfoutput.add_wrf_projection import _get_wrf_projection
+
+    crs = _get_wrf_projection(ds)
+    transformer = pyproj.Transformer.from_crs(crs.geodetic_crs, crs, always_xy=True)
+    receptor_x, receptor_y = transformer.transform(
+        ds.ReceptorLon.values, ds.ReceptorLat.values
+    )
+
+    names = ds.ReceptorName.values
+    if names.dtype.kind == "S":
+        names = np.char.decode(names)
+    coords = dict(
+        receptor=("receptor", np.char.strip(names.astype(str))),
+        ReceptorLon=("receptor", ds.ReceptorLon.values),
+        ReceptorLat=("receptor", ds.ReceptorLat.values),
+    )
+    return (
+        xr.DataArray(receptor_x, dims="receptor", coords=coords),
+        xr.DataArray(receptor_y, dims="receptor", coords=coords),
+    )
+
+
+def _extract_receptor_timeseries(
+    ds: xr.Dataset, variables: List[str], method: str = "linear"
+) -> xr.Dataset:
+    """
+    Extract the time series of all receptors at once from the gridded variables of a
+        postprocessed dataset.
+    """
+    receptor_x, receptor_y = _get_receptor_grid_positions(ds)
+    gridded = ds[variables]
+    gridded = gridded.drop_vars(
+        [
+            name
+            for name, coord in gridded.coords.items()
+            if name not in ["x", "y"] and {"x", "y"} & set(coord.dims)
+        ]
+    )
+
+    if method not in ["nearest", "linear"]:
+        raise ValueError(
+            f"Receptors can be extracted with nearest or linear, not {method}"
+        )
+
+    # interp fails without receptors, the gather returns an empty result instead
+    if method == "nearest" or receptor_x.size == 0:
+        # Pointwise gather on the regular grid, receptors outside the domain are NaN
+        indices = {}
+        for dim, position in [("x", receptor_x), ("y", receptor_y)]:
+            spacing = ds[dim].values[1] - ds[dim].values[0]
+            index = np.rint((position - ds[dim].values[0]) / spacing).astype(int)
+            indices[dim] = index.where((index >= 0) & (index < ds.sizes[dim]), -1)
+        outside = (indices["x"] == -1) | (indices["y"] == -1)
+        receptors = gridded.isel(
+            x=indices["x"].where(~outside, 0), y=indices["y"].where(~outside, 0)
+        )
+        receptors = receptors.where(~outside).drop_vars(["x", "y"])
+    else:
+        receptors = gridded.interp(x=receptor_x, y=receptor_y, method=method)
+        receptors = receptors.drop_vars(["x", "y"])
+
+    receptors = receptors.assign_coords(
+        receptor_x=("receptor", receptor_x.values),
+        receptor_y=("receptor", receptor_y.values),
+    )
+    receptors.receptor.attrs["description"] = "Names of the receptors"
+    receptors.receptor_x.attrs = dict(description="x position of receptor", units="m")
+    receptors.receptor_y.attrs = dict(description="y position of receptor", units="m")
+    return receptors.transpose("receptor", "Time", ..., missing_dims="ignore")
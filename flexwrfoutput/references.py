@@ -0,0 +1,182 @@
+"""
+Build and open a reference index over existing FLEXPART-WRF netCDF output.
+
+The index stores the byte ranges of the chunks of all `flxout*` and `header*` files
+(kerchunk format) in a single JSON file. Opening a run from the index reads the
+metadata from the index and only touches the netCDF files when data is loaded.
+Requires the optional dependencies `kerchunk`, `fsspec` and `zarr`.
+"""
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import xarray as xr
+
+from flexwrfoutput.openfiles import _combine_output_and_header, _get_output_paths
+
+INDEX_VERSION = 1
+
+
+def _translate_to_references(path: Path) -> dict:
+    """Scans a netCDF4/HDF5 file and returns the references to its chunks.
+
+    Args:
+        path (Path): Path of the netCDF file.
+
+    Returns:
+        dict: kerchunk references of the file.
+    """
+    try:
+        from kerchunk.hdf import SingleHdf5ToZarr
+    except ImportError as e:
+        raise ImportError(
+            "Building a reference index requires the optional dependency kerchunk."
+        ) from e
+
+    with open(path, "rb") as file:
+        return SingleHdf5ToZarr(
+            file, str(path.resolve()), inline_threshold=300
+        ).translate()
+
+
+def build_reference_index(
+    output_dirs: Iterable[Union[str, Path]],
+    index_path: Union[str, Path],
+    names: Optional[List[str]] = None,
+) -> Path:
+    """Scans the output of FLEXPART-WRF runs and writes a reference index of all files.
+
+    Args:
+        output_dirs (Iterable[Union[str, Path]]): Output directories of FLEXPART-WRF.
+        index_path (Union[str, Path]): Path of the JSON index file.
+        names (Optional[List[str]], optional): Names of the runs in the index. Defaults
+            to the names of the output directories.
+
+    Returns:
+        Path: Path of the written index.
+    """
+    output_dirs = [Path(output_dir) for output_dir in output_dirs]
+    names = names or [output_dir.resolve().name for output_dir in output_dirs]
+    if len(set(names)) != len(names):
+        raise ValueError("Names of the runs in the index have to be unique.")
+
+    runs = {}
+    for name, output_dir in zip(names, output_dirs):
+        flxout_path, header_path = _get_output_paths(output_dir)
+        runs[name] = dict(
+            flxout=_translate_to_references(flxout_path),
+            header=_translate_to_references(header_path),
+        )
+
+    index_path = Path(index_path)
+    with open(index_path, "w") as index_file:
+        json.dump(dict(version=INDEX_VERSION, runs=runs), index_file)
+    return index_path
+
+
+def _read_reference_index(index_path: Union[str, Path]) -> Dict[str, dict]:
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(
+            f"Unsupported reference index version {index.get('version')} in "
+            f"{index_path}"
+        )
+    return index["runs"]
+
+
+def _open_references(references: dict, chunks: Optional[dict]) -> xr.Dataset:
+    return xr.open_dataset(
+        "reference://",
+        engine="zarr",
+        chunks=chunks,
+        backend_kwargs=dict(
+            consolidated=False,
+            storage_options=dict(fo=references, remote_protocol="file"),
+        ),
+    )
+
+
+def _open_run_references(
+    run: dict, flxout_chunks: Optional[dict], header_chunks: Optional[dict]
+) -> xr.Dataset:
+    return _combine_output_and_header(
+        _open_references(run["flxout"], flxout_chunks),
+        _open_references(run["header"], header_chunks),
+    )
+
+
+class ReferenceRuns(Mapping):
+    """
+    Runs of a reference index by name. A run is only opened when it is accessed, the
+    opened dataset is kept for later accesses.
+    """
+
+    def __init__(
+        self,
+        runs: Dict[str, dict],
+        flxout_chunks: Optional[dict] = None,
+        header_chunks: Optional[dict] = None,
+    ) -> ReferenceRuns:
+        self._runs = runs
+        self._flxout_chunks = flxout_chunks
+        self._header_chunks = header_chunks
+        self._opened = {}
+
+    def __getitem__(self, name: str) -> xr.Dataset:
+        if name not in self._opened:
+            self._opened[name] = _open_run_references(
+                self._runs[name], self._flxout_chunks, self._header_chunks
+            )
+        return self._opened[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._runs)
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+
+def open_reference_output(
+    index_path: Union[str, Path],
+    name: str,
+    flxout_chunks: Optional[dict] = None,
+    header_chunks: Optional[dict] = None,
+) -> xr.Dataset:
+    """Opens a single run from a reference index like `open_output` opens a directory.
+
+    The whole index is parsed, use `open_reference_index` to open several runs.
+
+    Args:
+        index_path (Union[str, Path]): Path of the JSON index file.
+        name (str): Name of the run in the index.
+
+    Returns:
+        xr.Dataset: Merged data, ready for the `postprocess` accessor.
+    """
+    return open_reference_index(index_path, flxout_chunks, header_chunks)[name]
+
+
+def open_reference_index(
+    index_path: Union[str, Path],
+    flxout_chunks: Optional[dict] = None,
+    header_chunks: Optional[dict] = None,
+) -> ReferenceRuns:
+    """Opens a reference index of many runs.
+
+    Only the index is parsed here. Each run is opened when it is first accessed, and
+    its netCDF files are only read when data is loaded. The runs are not combined into
+    one dataset because their release and time dimensions generally differ.
+
+    Args:
+        index_path (Union[str, Path]): Path of the JSON index file.
+
+    Returns:
+        ReferenceRuns: Mapping of run names to merged data.
+    """
+    return ReferenceRuns(
+        _read_reference_index(index_path), flxout_chunks, header_chunks
+    )
@@ -0,0 +1,288 @@
+"""
+Index of compact footprint embeddings to find releases with similar footprints.
+
+Footprints of postprocessed output are summed over all dimensions except the releases
+and the horizontal grid, reduced to a short vector (coarse graining or random
+projection) and normalized. The cosine similarity of two releases is the dot product
+of their embeddings, so queries never touch the full footprints again.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+RELEASE_DIMS = ["MTime", "MPlace"]
+
+
+class FootprintIndex:
+    """
+    Normalized footprint embeddings of releases with nearest neighbour queries.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        mtime: np.ndarray,
+        mplace: np.ndarray,
+        method: str,
+        params: dict,
+    ) -> FootprintIndex:
+        self.embeddings = embeddings
+        self.mtime = mtime
+        self.mplace = mplace
+        self.method = method
+        self.params = params
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    @property
+    def keys(self) -> pd.DataFrame:
+        """MTime and MPlace of each release in the index."""
+        return pd.DataFrame(dict(MTime=self.mtime, MPlace=self.mplace))
+
+    @classmethod
+    def from_dataset(
+        cls,
+        ds: xr.Dataset,
+        variable: str = "CONC",
+        batch_size: int = 10,
+        **kwargs,
+    ) -> FootprintIndex:
+        """Builds the index from a postprocessed dataset, reading `batch_size` values of
+            MTime at a time.
+
+        Args:
+            ds (xr.Dataset): Postprocessed dataset.
+            variable (str, optional): Footprint variable. Defaults to "CONC".
+            batch_size (int, optional): Number of MTime values per batch. Defaults to
+                10.
+            **kwargs: Options of the embedding, see `from_batches`.
+
+        Returns:
+            FootprintIndex: Index of all releases with a footprint.
+        """
+        batches = (
+            ds[variable].isel(MTime=slice(start, start + batch_size))
+            for start in range(0, ds.sizes["MTime"], batch_size)
+        )
+        return cls.from_batches(batches, **kwargs)
+
+    @classmethod
+    def from_batches(
+        cls,
+        batches: Iterable[Union[xr.Dataset, xr.DataArray]],
+        variable: str = "CONC",
+        method: str = "coarsen",
+        factor: int = 4,
+        n_components: int = 256,
+        seed: int = 0,
+    ) -> FootprintIndex:
+        """Builds the index from batches of postprocessed footprints, e.g. from the
+            `iter_postprocessed` accessor.
+
+        Args:
+            batches (Iterable[Union[xr.Dataset, xr.DataArray]]): Postprocessed batches.
+            variable (str, optional): Footprint variable if batches are datasets.
+                Defaults to "CONC".
+            method (str, optional): "coarsen" (block means of `factor` x `factor` grid
+                cells) or "random" (Gaussian random projection to `n_components`).
+                Defaults to "coarsen".
+            factor (int, optional): Coarsening factor. Defaults to 4.
+            n_components (int, optional): Length of random projections. Defaults to
+                256.
+            seed (int, optional): Seed of the random projection. Defaults to 0.
+
+        Returns:
+            FootprintIndex: Index of all releases with a footprint.
+        """
+        if method not in ["coarsen", "random"]:
+            raise ValueError(
+                f"Embedding method has to be coarsen or random, not {method}"
+            )
+        params = dict(factor=factor, n_components=n_components, seed=seed)
+
+        embeddings, mtime, mplace = [], [], []
+        projection = None
+        for batch in batches:
+            footprint = batch[variable] if isinstance(batch, xr.Dataset) else batch
+            # min_count keeps missing releases NaN instead of summing them to zero
+            footprint = footprint.sum(
+                [dim for dim in footprint.dims if dim not in RELEASE_DIMS + ["y", "x"]],
+                min_count=1,
+            )
+            if method == "coarsen":
+                footprint = footprint.coarsen(y=factor, x=factor, boundary="pad").mean()
+            footprint = footprint.stack(release=RELEASE_DIMS).transpose("release", ...)
+            vectors = footprint.values.reshape(footprint.sizes["release"], -1)
+
+            # Release combinations missing in the output are NaN after the unstacking
+            valid = ~np.isnan(vectors).all(axis=1)
+            vectors = np.nan_to_num(vectors[valid]).astype("float32")
+            if method == "random":
+                if projection is None:
+                    projection = np.random.default_rng(seed).standard_normal(
+                        (vectors.shape[1], n_components), dtype="float32"
+                    ) / np.sqrt(n_components)
+                vectors = vectors @ projection
+            embeddings.append(_normalize(vectors))
+            mtime.append(footprint.MTime.values[valid])
+            mplace.append(_decode_names(footprint.MPlace.values[valid]))
+
+        if not embeddings:
+            raise ValueError("Cannot build an index without footprints.")
+        return cls(
+            np.concatenate(embeddings),
+            np.concatenate(mtime),
+            np.concatenate(mplace),
+            method,
+            params,
+        )
+
+    def _position(self, mtime, mplace) -> int:
+        matches = np.flatnonzero(
+            (self.mtime == np.datetime64(mtime, "ns"))
+            & (self.mplace == _decode_names([mplace])[0])
+        )
+        if not len(matches):
+            raise KeyError(f"Release ({mtime}, {mplace}) is not in the index")
+        return matches[0]
+
+    def query(self, mtime, mplace, k: int = 10) -> pd.DataFrame:
+        """Finds the k releases with the most similar footprint to a release in the
+            index.
+
+        Args:
+            mtime: MTime of the release.
+            mplace: MPlace of the release (str or bytes).
+            k (int, optional): Number of neighbours. Defaults to 10.
+
+        Returns:
+            pd.DataFrame: MTime, MPlace and cosine similarity of the neighbours, most
+                similar first.
+        """
+        position = self._position(mtime, mplace)
+        similarity = self.embeddings @ self.embeddings[position]
+        similarity[position] = -np.inf
+        return self._top_k(similarity, k)
+
+    def query_many(self, k: int = 10, block_size: int = 1024) -> xr.Dataset:
+        """Finds the k nearest neighbours of all releases in the index.
+
+        Similarities are computed in blocks of releases to bound the memory usage.
+
+        Args:
+            k (int, optional): Number of neighbours. Defaults to 10.
+            block_size (int, optional): Releases per block. Defaults to 1024.
+
+        Returns:
+            xr.Dataset: MTime, MPlace and cosine similarity of the neighbours with
+                dimensions release and neighbour (most similar first). The keys of the
+                releases are the coordinates MTime and MPlace.
+        """
+        k = max(min(k, len(self) - 1), 0)
+        neighbours = np.empty((len(self), k), dtype=int)
+        similarities = np.empty((len(self), k), dtype=self.embeddings.dtype)
+        for start in range(0, len(self) if k else 0, block_size):
+            block = slice(start, start + block_size)
+            similarity = self.embeddings[block] @ self.embeddings.T
+            rows = np.arange(similarity.shape[0])
+            similarity[rows, rows + start] = -np.inf
+            candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+            order = np.argsort(
+                -np.take_along_axis(similarity, candidates, axis=1), axis=1
+            )
+            neighbours[block] = np.take_along_axis(candidates, order, axis=1)
+            similarities[block] = np.take_along_axis(
+                similarity, neighbours[block], axis=1
+            )
+        return xr.Dataset(
+            data_vars=dict(
+                MTime_neighbour=(("release", "neighbour"), self.mtime[neighbours]),
+                MPlace_neighbour=(("release", "neighbour"), self.mplace[neighbours]),
+                similarity=(("release", "neighbour"), similarities),
+            ),
+            coords=dict(MTime=("release", self.mtime), MPlace=("release", self.mplace)),
+        )
+
+    def similarity_matrix(self, releases: Optional[np.ndarray] = None) -> xr.DataArray:
+        """Cosine similarity between the footprints of releases.
+
+        Args:
+            releases (Optional[np.ndarray], optional): Positions or boolean mask of the
+                releases in `keys`. Defaults to all releases.
+
+        Returns:
+            xr.DataArray: Similarity with dimensions release and release_other.
+        """
+        releases = slice(None) if releases is None else releases
+        embeddings = self.embeddings[releases]
+        mtime, mplace = self.mtime[releases], self.mplace[releases]
+        return xr.DataArray(
+            embeddings @ embeddings.T,
+            dims=("release", "release_other"),
+            coords=dict(
+                MTime=("release", mtime),
+                MPlace=("release", mplace),
+                MTime_other=("release_other", mtime),
+                MPlace_other=("release_other", mplace),
+            ),
+            attrs=dict(description="Cosine similarity of footprints"),
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Saves the index to a numpy `.npz` file."""
+        np.savez(
+            path,
+            embeddings=self.embeddings,
+            mtime=self.mtime,
+            mplace=self.mplace,
+            method=self.method,
+            params=json.dumps(self.params),
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> FootprintIndex:
+        """Loads an index saved with `save`."""
+        with np.load(path) as index:
+            return cls(
+                index["embeddings"],
+                index["mtime"],
+                index["mplace"],
+                str(index["method"]),
+                json.loads(str(index["params"])),
+            )
+
+    def _top_k(self, similarity: np.ndarray, k: int) -> pd.DataFrame:
+        k = min(k, len(similarity) - 1)
+        if k < 1:
+            candidates = np.empty(0, dtype=int)
+        else:
+            candidates = np.argpartition(-similarity, k - 1)[:k]
+        candidates = candidates[np.argsort(-similarity[candidates])]
+        return pd.DataFrame(
+            dict(
+                MTime=self.mtime[candidates],
+                MPlace=self.mplace[candidates],
+                similarity=similarity[candidates],
+            )
+        )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, zero vectors are kept."""
+    norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norm > 0, norm, 1)
+
+
+def _decode_names(names: Iterable) -> np.ndarray:
+    """Release names as str, ReleaseName is stored as bytes in the header."""
+    return np.array(
+        [name.decode() if isinstance(name, bytes) else str(name) for name in names],
+        dtype=str,
+    )
@@ -82,3 +82,33 @@ def test_add_wrf_projection(flxout_path, header_path):
     output = output.drop_vars("wrf_projection")
     output = output.flexwrf.add_wrf_projection()
     assert output.wrf_projection.item() == old_projection
+
+
+@pytest.mark.parametrize("by", ["MTime", "MPlace"])
+@pytest.mark.parametrize(
+    "flxout_path, header_path",
+    [
+        (
+            FILE_EXAMPLES / "degree" / "flxout_degree.nc",
+            FILE_EXAMPLES / "degree" / "header_degree.nc",
+        ),
+        (
+            FILE_EXAMPLES / "meter" / "flxout_meters.nc",
+            FILE_EXAMPLES / "meter" / "header_meters.nc",
+        ),
+    ],
+)
+def test_iter_postprocessed(flxout_path, header_path, by):
+    output = _combine_output_and_header(
+        xr.open_dataset(flxout_path), xr.open_dataset(header_path)
+    )
+    full = output.copy(deep=True).flexwrf.postprocess()
+    batches = list(output.flexwrf.iter_postprocessed(batch_size=1, by=by))
+    assert len(batches) == full.sizes[by]
+    for batch in batches:
+        assert batch.sizes[by] == 1
+        expected = full.sel(MTime=batch.MTime.values, MPlace=batch.MPlace.values)
+        assert batch.wrf_projection.item() == expected.wrf_projection.item()
+        xr.testing.assert_identical(
+            batch.drop_vars("wrf_projection"), expected.drop_vars("wrf_projection")
+        )
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+import pytest
+import xarray as xr
+
+import flexwrfoutput.batch
+from flexwrfoutput.batch import STATE_FILENAME, run_batch
+from flexwrfoutput.cli import main
+
+FILE_EXAMPLES = Path(__file__).parent / "file_examples"
+
+
+@pytest.fixture
+def output_directories(tmp_path):
+    runs = tmp_path / "runs"
+    for name in ["degree", "meter"]:
+        shutil.copytree(FILE_EXAMPLES / name, runs / name)
+    return runs
+
+
+def test_run_batch(output_directories, tmp_path):
+    target_dir = tmp_path / "postprocessed"
+    summary = run_batch([output_directories / "*"], target_dir, max_workers=2)
+    assert summary["done"] == 2
+    assert summary["failed"] == 0
+
+    state = json.loads((target_dir / STATE_FILENAME).read_text())
+    assert all(entry["status"] == "done" for entry in state.values())
+
+    output = xr.open_dataset(target_dir / "meter.nc").flexwrf.add_wrf_projection()
+    assert "MTime" in output.sizes
+    assert output.wrf_projection.item() is not None
+
+
+def test_resume_batch(output_directories, tmp_path):
+    target_dir = tmp_path / "postprocessed"
+    run_batch([output_directories / "degree"], target_dir, max_workers=1)
+    summary = run_batch([output_directories / "*"], target_dir, max_workers=1)
+    assert summary["skipped"] == 1
+    assert summary["done"] == 1
+
+
+def test_failed_run_is_recorded(output_directories, tmp_path):
+    (output_directories / "empty").mkdir()
+    target_dir = tmp_path / "postprocessed"
+    assert main(["batch", str(output_directories / "*"), "-o", str(target_dir)]) == 1
+    state = json.loads((target_dir / STATE_FILENAME).read_text())
+    assert state[str((output_directories / "empty").resolve())]["status"] == "failed"
+
+
+def test_interrupted_batch_records_finished_runs(
+    output_directories, tmp_path, monkeypatch
+):
+    def interrupt_after_first(futures):
+        wait(futures, return_when=FIRST_COMPLETED)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(flexwrfoutput.batch, "as_completed", interrupt_after_first)
+    target_dir = tmp_path / "postprocessed"
+    with pytest.raises(KeyboardInterrupt):
+        run_batch([output_directories / "*"], target_dir, max_workers=1)
+    state = json.loads((target_dir / STATE_FILENAME).read_text())
+    assert any(entry["status"] == "done" for entry in state.values())
+
+
+def test_default_workers_without_sched_getaffinity(
+    output_directories, tmp_path, monkeypatch
+):
+    monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+    summary = run_batch([output_directories / "degree"], tmp_path / "postprocessed")
+    assert summary["done"] == 1
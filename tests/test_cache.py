@@ -0,0 +1,73 @@
+import shutil
+from pathlib import Path
+
+import pytest
+import xarray as xr
+
+from flexwrfoutput.cache import _evict_cache_entries, open_postprocessed_output
+
+FILE_EXAMPLES = Path(__file__).parent / "file_examples"
+
+
+@pytest.fixture
+def output_directory(tmp_path):
+    output_dir = tmp_path / "meter"
+    shutil.copytree(FILE_EXAMPLES / "meter", output_dir)
+    return output_dir
+
+
+def test_cache_hit(output_directory, tmp_path):
+    cache_dir = tmp_path / "cache"
+    first = open_postprocessed_output(output_directory, cache_dir=cache_dir)
+    entries = list(cache_dir.glob("*.nc"))
+    assert len(entries) == 1
+    second = open_postprocessed_output(output_directory, cache_dir=cache_dir)
+    assert list(cache_dir.glob("*.nc")) == entries
+    xr.testing.assert_identical(first, second)
+
+
+def test_cache_invalidation(output_directory, tmp_path):
+    cache_dir = tmp_path / "cache"
+    open_postprocessed_output(output_directory, cache_dir=cache_dir)
+    (output_directory / "header_meters.nc").touch()
+    open_postprocessed_output(output_directory, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.nc"))) == 2
+
+
+def test_cache_eviction(output_directory, tmp_path):
+    cache_dir = tmp_path / "cache"
+    open_postprocessed_output(output_directory, cache_dir=cache_dir)
+    (output_directory / "header_meters.nc").touch()
+    output = open_postprocessed_output(
+        output_directory, cache_dir=cache_dir, max_cache_size=1
+    )
+    # The entry of the opened dataset is kept
+    assert len(list(cache_dir.glob("*.nc"))) == 1
+    assert "MTime" in output.sizes
+    assert "wrf_projection" in output
+    output.close()
+    _evict_cache_entries(cache_dir, 1)
+    assert list(cache_dir.glob("*.nc")) == []
+
+
+def test_cache_entry_in_use(output_directory, tmp_path):
+    cache_dir = tmp_path / "cache"
+    open_postprocessed_output(output_directory, cache_dir=cache_dir).close()
+    hit = open_postprocessed_output(output_directory, cache_dir=cache_dir, chunks={})
+    _evict_cache_entries(cache_dir, 0)
+    assert len(list(cache_dir.glob("*.nc"))) == 1
+    with xr.set_options(file_cache_maxsize=1):
+        # Force xarray to reopen the entry when loading
+        xr.open_dataset(output_directory / "header_meters.nc").close()
+        assert hit.CONC.load().notnull().any()
+
+
+def test_cache_chunks(output_directory, tmp_path):
+    output = open_postprocessed_output(output_directory, chunks={})
+    assert output.CONC.chunks is not None
+    cache_dir = tmp_path / "cache"
+    for _ in range(2):
+        output = open_postprocessed_output(
+            output_directory, cache_dir=cache_dir, chunks={}
+        )
+        assert output.CONC.chunks is not None
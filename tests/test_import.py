@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["xwrf", "pyproj"]
+
+# Allowed import time of flexwrfoutput on top of xarray (seconds)
+MAX_IMPORT_OVERHEAD = 0.5
+
+
+def _import_time(module: str) -> float:
+    """Import time of a module in a fresh interpreter (best of three runs)."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    return min(
+        float(subprocess.check_output([sys.executable, "-c", code])) for _ in range(3)
+    )
+
+
+def test_heavy_modules_are_deferred():
+    code = (
+        "import sys, xarray as xr, flexwrfoutput; "
+        "assert hasattr(xr.Dataset, 'flexwrf'); "
+        f"print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    )
+    loaded = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert loaded.strip() == ""
+
+
+@pytest.mark.skipif(
+    not os.environ.get("FLEXWRFOUTPUT_BENCHMARK"),
+    reason="wall-clock benchmark, set FLEXWRFOUTPUT_BENCHMARK=1 to run",
+)
+def test_import_time():
+    overhead = _import_time("flexwrfoutput") - _import_time("xarray")
+    assert overhead < MAX_IMPORT_OVERHEAD
@@ -0,0 +1,80 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from flexwrfoutput.nested import _get_outer_grid_mapping, combine_nested_footprints
+from flexwrfoutput.openfiles import (
+    AmbiguousPathError,
+    _get_datatree_class,
+    _get_nested_output_paths,
+    _get_output_paths,
+    open_nested_output,
+)
+
+FILE_EXAMPLES = Path(__file__).parent / "file_examples"
+
+try:
+    _get_datatree_class()
+    HAS_DATATREE = True
+except ImportError:
+    HAS_DATATREE = False
+requires_datatree = pytest.mark.skipif(
+    not HAS_DATATREE, reason="requires xarray>=2024.10 or xarray-datatree"
+)
+
+
+@pytest.fixture
+def nested_output_directory(tmp_path):
+    output_dir = tmp_path / "nested_output"
+    output_dir.mkdir()
+    for domain in ["d01", "d02"]:
+        shutil.copy(
+            FILE_EXAMPLES / "meter" / "flxout_meters.nc",
+            output_dir / f"flxout_{domain}_20210802_000000.nc",
+        )
+        shutil.copy(
+            FILE_EXAMPLES / "meter" / "header_meters.nc",
+            output_dir / f"header_{domain}.nc",
+        )
+    return output_dir
+
+
+def test_get_nested_output_paths(nested_output_directory):
+    with pytest.raises(AmbiguousPathError):
+        _get_output_paths(nested_output_directory)
+    paths = _get_nested_output_paths(nested_output_directory)
+    assert list(paths) == ["d01", "d02"]
+    assert paths["d02"][1].name == "header_d02.nc"
+
+
+def test_missing_nested_header(nested_output_directory):
+    (nested_output_directory / "header_d02.nc").unlink()
+    with pytest.raises(FileNotFoundError):
+        _get_nested_output_paths(nested_output_directory)
+
+
+@requires_datatree
+def test_open_nested_output(nested_output_directory):
+    tree = open_nested_output(nested_output_directory)
+    assert set(tree.children) == {"d01", "d02"}
+    assert "wrf_projection" in tree["d02"].to_dataset()
+
+
+@requires_datatree
+def test_combine_nested_footprints(nested_output_directory):
+    tree = open_nested_output(nested_output_directory)
+    combined = combine_nested_footprints(tree)
+    outer = tree["d01"].to_dataset().CONC
+    assert combined.dims == outer.dims
+    # identical domains: each outer cell is the mean of the same inner cell
+    np.testing.assert_allclose(combined.values, outer.values, equal_nan=True)
+
+
+@requires_datatree
+def test_nested_grid_mapping_is_cached(nested_output_directory):
+    tree = open_nested_output(nested_output_directory)
+    outer, inner = tree["d01"].to_dataset(), tree["d02"].to_dataset()
+    first = _get_outer_grid_mapping(outer, inner)
+    assert _get_outer_grid_mapping(outer, inner) is first
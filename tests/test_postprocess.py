@@ -5,9 +5,11 @@ import pint
 import pytest
 import xarray as xr
 
-from flexwrfoutput.openfiles import _combine_output_and_header
+import flexwrfoutput  # noqa: F401
+from flexwrfoutput.openfiles import _combine_output_and_header, open_output
 from flexwrfoutput.postprocess import (
     _assign_time_coord,
+    _extract_receptor_timeseries,
     _make_attrs_consistent,
     _prepare_conc_units,
     _prepare_coordinates,
@@ -161,3 +163,52 @@ def test_split_releases_into_multiple_dimensions(combined_flxout_ds):
     ds = _split_releases_into_multiple_dimensions(ds)
     assert "MTime" in ds.sizes
     assert "MPlace" in ds.sizes
+
+
+@pytest.fixture
+def receptor_output():
+    output = _combine_output_and_header(
+        xr.open_dataset(FILE_EXAMPLES / "meter" / "flxout_meters.nc"),
+        xr.open_dataset(FILE_EXAMPLES / "meter" / "header_meters.nc"),
+    ).flexwrf.postprocess()
+    cells = dict(
+        y=xr.DataArray([1, 2], dims="receptors"),
+        x=xr.DataArray([2, 1], dims="receptors"),
+    )
+    output = output.drop_dims("receptors", errors="ignore").assign(
+        ReceptorLon=output.XLONG.isel(cells).reset_coords(drop=True),
+        ReceptorLat=output.XLAT.isel(cells).reset_coords(drop=True),
+        ReceptorName=("receptors", np.array([b"rec_1   ", b"rec_2   "])),
+    )
+    return output, cells
+
+
+def test_extract_receptor_timeseries_nearest(receptor_output):
+    output, cells = receptor_output
+    receptors = _extract_receptor_timeseries(output, ["CONC"], method="nearest")
+    assert receptors.CONC.dims[:2] == ("receptor", "Time")
+    assert list(receptors.receptor.values) == ["rec_1", "rec_2"]
+    assert np.issubdtype(receptors.Time.dtype, np.datetime64)
+    expected = output.CONC.isel(
+        y=cells["y"].rename(receptors="receptor"),
+        x=cells["x"].rename(receptors="receptor"),
+    )
+    np.testing.assert_array_equal(
+        receptors.CONC.values, expected.transpose(*receptors.CONC.dims).values
+    )
+
+
+def test_extract_receptor_timeseries_linear(receptor_output):
+    output, _ = receptor_output
+    receptors = output.flexwrf.extract_receptors()
+    assert receptors.sizes["receptor"] == 2
+    assert receptors.CONC.dims[:2] == ("receptor", "Time")
+
+
+@pytest.mark.parametrize("method", ["nearest", "linear"])
+def test_extract_receptor_timeseries_without_receptors(method):
+    output = open_output(FILE_EXAMPLES / "meter").flexwrf.postprocess()
+    receptors = output.flexwrf.extract_receptors(method=method)
+    assert receptors.sizes["receptor"] == 0
+    assert receptors.CONC.dims[:2] == ("receptor", "Time")
+    assert receptors.sizes["Time"] == output.sizes["Time"]
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+import flexwrfoutput as fwo
+
+pytest.importorskip("kerchunk")
+
+from flexwrfoutput.references import (  # noqa: E402
+    build_reference_index,
+    open_reference_index,
+    open_reference_output,
+)
+
+FILE_EXAMPLES = Path(__file__).parent / "file_examples"
+
+
+@pytest.fixture
+def reference_index(tmp_path):
+    return build_reference_index(
+        [FILE_EXAMPLES / "degree", FILE_EXAMPLES / "meter"],
+        tmp_path / "index.json",
+    )
+
+
+def test_open_reference_output(reference_index):
+    output = open_reference_output(reference_index, "meter")
+    expected = fwo.open_output(FILE_EXAMPLES / "meter")
+    assert (output.CONC.values == expected.CONC.values).all()
+    output = output.flexwrf.postprocess()
+    assert "MTime" in output.sizes
+
+
+def test_open_reference_index(reference_index):
+    outputs = open_reference_index(reference_index, flxout_chunks={})
+    assert set(outputs) == {"degree", "meter"}
+    assert outputs._opened == {}
+    assert outputs["degree"].CONC.chunks is not None
+    assert outputs["degree"] is outputs["degree"]
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import flexwrfoutput as fwo
+from flexwrfoutput.similarity import FootprintIndex
+
+FILE_EXAMPLES = Path(__file__).parent / "file_examples"
+
+
+@pytest.fixture(scope="module")
+def postprocessed_output():
+    return fwo.open_output(FILE_EXAMPLES / "meter").flexwrf.postprocess()
+
+
+@pytest.mark.parametrize("method", ["coarsen", "random"])
+def test_build_index(postprocessed_output, method):
+    index = FootprintIndex.from_dataset(
+        postprocessed_output, batch_size=1, method=method, factor=2, n_components=8
+    )
+    sizes = postprocessed_output.sizes
+    assert 0 < len(index) <= sizes["MTime"] * sizes["MPlace"]
+    norms = np.linalg.norm(index.embeddings, axis=1)
+    assert np.allclose(norms[norms > 0], 1, atol=1e-5)
+
+
+def test_query(postprocessed_output):
+    index = FootprintIndex.from_dataset(postprocessed_output, factor=2)
+    mtime, mplace = index.keys.iloc[0]
+    neighbours = index.query(mtime, mplace, k=3)
+    assert len(neighbours) == min(3, len(index) - 1)
+    assert (np.diff(neighbours.similarity.values) <= 0).all()
+    assert not ((neighbours.MTime == mtime) & (neighbours.MPlace == mplace)).any()
+
+    all_neighbours = index.query_many(k=3)
+    assert dict(all_neighbours.sizes) == dict(
+        release=len(index), neighbour=min(3, len(index) - 1)
+    )
+    assert all_neighbours.MPlace_neighbour.isin(index.mplace).all()
+
+
+def test_query_without_neighbours(postprocessed_output):
+    index = FootprintIndex.from_dataset(postprocessed_output, factor=2)
+    mtime, mplace = index.keys.iloc[0]
+    assert len(index.query(mtime, mplace, k=0)) == 0
+    assert index.query_many(k=0).sizes["neighbour"] == 0
+
+
+def test_sparse_release_grid():
+    rng = np.random.default_rng(0)
+    footprint = xr.DataArray(
+        rng.random((2, 2, 3, 4, 4)),
+        dims=("MTime", "MPlace", "Time", "y", "x"),
+        coords=dict(
+            MTime=np.array(["2021-08-02T00", "2021-08-02T01"], dtype="datetime64[ns]"),
+            MPlace=np.array([b"north", b"south"]),
+        ),
+    )
+    # releases missing in the output are NaN after the unstacking
+    footprint[1, 0] = np.nan
+    index = FootprintIndex.from_batches([footprint], factor=2)
+    assert len(index) == 3
+    assert not (
+        (index.keys.MTime == footprint.MTime.values[1]) & (index.keys.MPlace == "north")
+    ).any()
+    assert index.similarity_matrix().sizes["release"] == 3
+
+
+def test_similarity_matrix_and_io(postprocessed_output, tmp_path):
+    index = FootprintIndex.from_dataset(postprocessed_output, factor=2)
+    similarity = index.similarity_matrix()
+    assert similarity.dims == ("release", "release_other")
+    np.testing.assert_allclose(similarity.values, similarity.values.T, atol=1e-6)
+
+    index.save(tmp_path / "index.npz")
+    loaded = FootprintIndex.load(tmp_path / "index.npz")
+    np.testing.assert_array_equal(loaded.embeddings, index.embeddings)
+    assert loaded.params == index.params
+    assert list(loaded.mplace) == list(index.mplace)
+
+    mtime, mplace = postprocessed_output.MTime.values[0], b"north"
+    pd.testing.assert_frame_equal(
+        loaded.query(mtime, mplace, k=3), index.query(mtime, mplace, k=3)
+    )